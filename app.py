@@ -5,11 +5,10 @@ Analyzes images using GPT-4o vision capabilities.
 """
 
 import argparse
+import mmap
 import sys
 from pathlib import Path
 
-from image_analyzer import AzureImageAnalyzer
-
 
 def main():
     """
@@ -41,6 +40,24 @@ Examples:
         help="Custom prompt for image analysis"
     )
     
+    parser.add_argument(
+        "--max-dim",
+        type=int,
+        help="Downscale images larger than this many pixels on either side before upload"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the API instead of reusing locally cached results"
+    )
+    
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        help="Maximum age in seconds of a cached result to reuse"
+    )
+    
     args = parser.parse_args()
     
     # Validate image file exists
@@ -48,22 +65,33 @@ Examples:
     if not image_path.exists():
         print(f"Error: Image file not found: {args.image_path}")
         sys.exit(1)
+    if image_path.stat().st_size == 0:
+        print(f"Error: Image file is empty: {args.image_path}")
+        sys.exit(1)
+    
+    # Import the analyzer only once arguments are valid, so --help and
+    # usage errors never pay for loading the Azure OpenAI SDK
+    from image_analyzer import AzureImageAnalyzer
     
     try:
         # Create analyzer instance
-        analyzer = AzureImageAnalyzer()
-        
-        # Read image file
-        with open(image_path, "rb") as image_file:
-            image_data = image_file.read()
-        
-        # Analyze image
-        description = analyzer.analyze_image(
-            image_data=image_data,
-            system_prompt=args.system_prompt,
-            user_prompt=args.prompt
+        analyzer = AzureImageAnalyzer(
+            use_cache=not args.no_cache,
+            cache_ttl=args.cache_ttl
         )
         
+        # Memory-map the image file so the page cache backs the bytes and the
+        # encoder reads them without first copying the whole file onto the heap
+        with open(image_path, "rb") as image_file, \
+                mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as image_data:
+            # Analyze image
+            description = analyzer.analyze_image(
+                image_data=image_data,
+                system_prompt=args.system_prompt,
+                user_prompt=args.prompt,
+                max_dim=args.max_dim
+            )
+        
         # Output result
         print("\n" + "="*50)
         print("IMAGE ANALYSIS RESULT")
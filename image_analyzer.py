@@ -4,17 +4,364 @@ Image Analysis Module using Azure OpenAI
 Provides stateless image analysis capabilities.
 """
 
+import asyncio
 import base64
+import contextlib
+import functools
+import hashlib
+import json
 import os
-from typing import Optional
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
+from urllib.parse import urlsplit
 
-from openai import AzureOpenAI
-from dotenv import load_dotenv
-from PIL import Image
+try:
+    # SIMD-accelerated drop-in replacement for the stdlib encoder
+    import pybase64 as _b64
+except ImportError:
+    _b64 = base64
 
-# Load environment variables
-load_dotenv()
+# pybase64 can encode straight to str, skipping the intermediate bytes object
+_b64encode_as_string = getattr(_b64, "b64encode_as_string", None)
+
+try:
+    # Vectorized hash for cache keys; hashlib.sha256 already uses OpenSSL
+    from blake3 import blake3 as _hash
+except ImportError:
+    _hash = hashlib.sha256
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "image2markdown" / "responses.sqlite"
+
+# Retries performed by the OpenAI SDK for transient API failures
+MAX_RETRIES = 3
+
+# Appended to the analysis prompt when several images share one request
+BUNDLE_INSTRUCTION = (
+    "Several images follow. Analyze each image independently as instructed above. "
+    'Respond with a JSON object of the form {"analyses": [...]} holding one string '
+    "per image, in the order the images are given."
+)
+
+# Lifetime of the read-only SAS URL sent for an uploaded image, in seconds.
+# Batch requests may only run at the end of their 24 hour completion window.
+BLOB_URL_TTL = 15 * 60
+BATCH_BLOB_URL_TTL = 25 * 60 * 60
+
+# Batch job states after which no more output will be produced
+BATCH_FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+# Images smaller than this are sent as-is even when a max_dim is requested
+DOWNSCALE_MIN_BYTES = 512 * 1024
+
+# Default prompts. The system message and the text part of the user message
+# always precede the image, so keeping them byte-identical across calls lets
+# Azure OpenAI's automatic prompt caching reuse the prefix.
+DEFAULT_SYSTEM_PROMPT = (
+    "You are an expert image analyst. Provide detailed, accurate descriptions of images. "
+    "Be thorough but concise in your analysis."
+)
+
+DEFAULT_USER_PROMPT = (
+    "Analyze this image and provide a detailed description. "
+    "Include information about objects, people, setting, colors, mood, "
+    "and any text visible in the image."
+)
+
+
+@dataclass(frozen=True)
+class AzureConfig:
+    """Azure OpenAI connection settings."""
+    
+    endpoint: Optional[str]
+    api_key: Optional[str]
+    image_container_url: Optional[str] = None
+    image_account_key: Optional[str] = None
+    api_version: str = "2024-12-01-preview"
+    model: str = "gpt-4o"
+    # Output token limit of the deployment; some gpt-4o versions allow only 4096
+    max_output_tokens: int = 4096
+
+
+@functools.lru_cache(maxsize=1)
+def _config() -> AzureConfig:
+    """Load .env and read the Azure OpenAI settings once per process."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return AzureConfig(
+        endpoint=os.getenv("AZURE_AI_ENDPOINT"),
+        api_key=os.getenv("AZURE_AI_API_KEY"),
+        image_container_url=os.getenv("AZURE_AI_IMAGE_CONTAINER_URL"),
+        image_account_key=os.getenv("AZURE_AI_IMAGE_ACCOUNT_KEY"),
+        max_output_tokens=int(os.getenv("AZURE_AI_MAX_OUTPUT_TOKENS", "4096")),
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(endpoint: str, api_key: str, api_version: str):
+    """
+    Return a shared Azure OpenAI client for the given configuration.
+    
+    The client owns an httpx connection pool and is thread-safe, so reusing it
+    across analyzer instances avoids repeated TCP and TLS handshakes.
+    """
+    # SDK imported lazily to keep CLI startup fast
+    from openai import AzureOpenAI
+    
+    return AzureOpenAI(
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        api_key=api_key,
+        **_client_options(),
+    )
+
+
+def _client_options(is_async: bool = False) -> Dict[str, Any]:
+    """
+    Retry, timeout and connection settings shared by the sync and async clients.
+    
+    The SDK retries connection errors, 408/409/429 and 5xx responses with
+    jittered exponential backoff and honors the server's Retry-After headers.
+    The HTTP client keeps connections alive between requests and multiplexes
+    concurrent requests over HTTP/2 when the optional h2 package is installed.
+    """
+    import importlib.util
+    
+    import httpx
+    from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+    
+    http_client_class = DefaultAsyncHttpxClient if is_async else DefaultHttpxClient
+    return {
+        "max_retries": MAX_RETRIES,
+        "timeout": httpx.Timeout(60.0, connect=5.0),
+        "http_client": http_client_class(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        ),
+    }
+
+
+@functools.lru_cache(maxsize=16)
+def _prefix_messages(system_message: str, user_message: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Return the system message and user text part for a prompt pair.
+    
+    These only depend on the prompts, so they are built once and shared by
+    every request that uses the same prompts. Callers must not mutate them.
+    """
+    return (
+        {"role": "system", "content": system_message},
+        {"type": "text", "text": user_message},
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _key_suffix(
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    max_dim: Optional[int],
+    bundled: bool
+) -> bytes:
+    """
+    Return the bytes hashed after the image digest in a cache key.
+    
+    Encoded once per prompt pair, model and downscale limit rather than for
+    every image analyzed with them. Each text field is length-prefixed, so
+    prompts containing the separator cannot make two requests share a key.
+    """
+    suffix = b""
+    for part in (system_prompt, user_prompt, model):
+        encoded = part.encode("utf-8")
+        suffix += len(encoded).to_bytes(8, "big") + encoded
+    if max_dim is not None:
+        suffix += f"|max_dim={max_dim}".encode("ascii")
+    if bundled:
+        suffix += b"|bundled"
+    return suffix
+
+
+def _sniff_mime(data: bytes) -> str:
+    """
+    Detect an image MIME type from its magic bytes.
+    
+    Args:
+        data: Raw image bytes (only the first 12 bytes are inspected)
+        
+    Returns:
+        MIME type string, falling back to image/jpeg for unknown formats
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:2] == b"BM":
+        return "image/bmp"
+    return "image/jpeg"
+
+
+def _downscale(image_data: bytes, max_dim: int) -> bytes:
+    """
+    Shrink an oversize image to fit within max_dim x max_dim as JPEG (quality 85).
+    
+    Small files and images already within the limit are returned unchanged.
+    Pillow only reads the image header until a resize is actually needed.
+    
+    Args:
+        image_data: Raw image bytes
+        max_dim: Maximum width and height in pixels
+        
+    Returns:
+        Image bytes to send to the API
+    """
+    if len(image_data) <= DOWNSCALE_MIN_BYTES:
+        return image_data
+    
+    import io
+    from PIL import Image, ImageOps
+    
+    with Image.open(io.BytesIO(image_data)) as img:
+        if max(img.size) <= max_dim:
+            return image_data
+        # The re-encoded JPEG carries no EXIF, so apply its orientation to the pixels
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            # Composite onto white; dropping alpha would expose whatever the
+            # transparent pixels hold (often black, hiding dark text)
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, "white")
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        # Resize after converting, so palette images are resampled in RGB too
+        img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+def _group_duplicates(image_list: List[bytes]) -> Dict[bytes, List[int]]:
+    """
+    Group the indices of byte-identical images, in order of first appearance.
+    
+    Args:
+        image_list: List of raw image bytes
+        
+    Returns:
+        Mapping from each distinct image's digest (reusable as the image_digest
+        of a cache key) to its indices; the first index is the one analyzed
+    """
+    groups: Dict[bytes, List[int]] = {}
+    for index, image_data in enumerate(image_list):
+        groups.setdefault(_hash(image_data).digest(), []).append(index)
+    return groups
+
+
+def _copy_to_duplicates(
+    results: List[Dict[str, Any]],
+    groups: List[List[int]]
+) -> List[Dict[str, Any]]:
+    """Fill in results for repeated images from the result of their first occurrence."""
+    for indices in groups:
+        for index in indices[1:]:
+            results[index] = {**results[indices[0]], "index": index}
+    return results
+
+
+@dataclass
+class BatchJob:
+    """A submitted Azure OpenAI batch job and the state needed to collect its results."""
+    
+    results: List[Dict[str, Any]]
+    groups: List[List[int]]
+    # custom_id -> cache key for requests still waiting on the job
+    pending: Dict[str, Optional[bytes]] = field(default_factory=dict)
+    batch_id: Optional[str] = None
+    status: str = "completed"
+
+
+class ResponseCache:
+    """
+    Local SQLite cache of analysis results keyed by the exact request inputs.
+    Lets repeated runs on the same image and prompts skip the API round-trip.
+    """
+    
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, ttl: Optional[int] = None):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: Location of the SQLite database file
+            ttl: Maximum age of a cached response in seconds (None keeps forever)
+        """
+        self.ttl = ttl
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key BLOB PRIMARY KEY, response TEXT, created INTEGER)"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(
+        image_data: bytes,
+        system_prompt: str,
+        user_prompt: str,
+        model: str,
+        max_dim: Optional[int] = None,
+        bundled: bool = False,
+        image_digest: Optional[bytes] = None
+    ) -> bytes:
+        """
+        Compute the cache key for an image, prompt pair, model and downscale limit.
+        
+        Analyses from bundled requests are answered under a different prompt,
+        so they are keyed apart from single-image analyses. Pass image_digest
+        (from _group_duplicates) when the image has already been hashed.
+        """
+        # Hashing the fixed-size image digest keeps the image/prompt boundary unambiguous
+        digest = _hash(image_digest or _hash(image_data).digest())
+        digest.update(_key_suffix(system_prompt, user_prompt, model, max_dim, bundled))
+        return digest.digest()
+    
+    def get(self, key: bytes) -> Optional[str]:
+        """Return the cached response for key, or None on a miss or expired entry."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        response, created = row
+        if self.ttl is not None and time.time() - created > self.ttl:
+            return None
+        return response
+    
+    def put(self, key: bytes, response: str) -> None:
+        """Store a response under key, replacing any previous entry."""
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, response, created) VALUES (?, ?, ?)",
+                    (key, response, int(time.time()))
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                # A failed cache write (e.g. full disk) must not fail the analysis
+                self._conn.rollback()
 
 
 class AzureImageAnalyzer:
@@ -23,12 +370,34 @@ class AzureImageAnalyzer:
     Follows Azure security best practices with managed identity support.
     """
     
-    def __init__(self):
-        """Initialize the image analyzer with Azure OpenAI configuration."""
-        self.endpoint = os.getenv("AZURE_AI_ENDPOINT")
-        self.api_key = os.getenv("AZURE_AI_API_KEY")
-        self.api_version = "2024-12-01-preview"
-        self.model = "gpt-4o"
+    def __init__(
+        self,
+        use_cache: bool = True,
+        cache_ttl: Optional[int] = None,
+        max_concurrency: int = 8,
+        blob_container_client=None
+    ):
+        """
+        Initialize the image analyzer with Azure OpenAI configuration.
+        
+        Args:
+            use_cache: Whether to reuse locally cached responses for identical requests
+            cache_ttl: Maximum age of a cached response in seconds (None keeps forever)
+            max_concurrency: Default number of requests in flight for multi-image analysis
+            blob_container_client: Optional azure.storage.blob ContainerClient
+                authorized with an account key or an Azure AD token credential.
+                When set (or when AZURE_AI_IMAGE_CONTAINER_URL is configured),
+                images are uploaded there and referenced by a URL carrying a
+                short-lived, read-only SAS for that blob alone, instead of being
+                inlined as base64.
+        """
+        config = _config()
+        
+        self.endpoint = config.endpoint
+        self.api_key = config.api_key
+        self.api_version = config.api_version
+        self.model = config.model
+        self.max_output_tokens = config.max_output_tokens
         
         if not self.endpoint or not self.api_key:
             raise ValueError(
@@ -36,30 +405,96 @@ class AzureImageAnalyzer:
                 "Please set AZURE_AI_ENDPOINT and AZURE_AI_API_KEY environment variables."
             )
         
-        # Create Azure OpenAI client
-        self.client = AzureOpenAI(
-            api_version=self.api_version,
-            azure_endpoint=self.endpoint,
-            api_key=self.api_key,
+        # Share one Azure OpenAI client (and its connection pool) per configuration
+        self.client = _get_client(self.endpoint, self.api_key, self.api_version)
+        
+        self.cache = None
+        if use_cache:
+            try:
+                self.cache = ResponseCache(ttl=cache_ttl)
+            except (OSError, sqlite3.Error):
+                # e.g. a read-only home directory; analyze without the local cache
+                self.cache = None
+        self.max_concurrency = max_concurrency
+        
+        if blob_container_client is None and config.image_container_url:
+            from azure.storage.blob import ContainerClient
+            
+            if urlsplit(config.image_container_url).query:
+                raise ValueError(
+                    "AZURE_AI_IMAGE_CONTAINER_URL must not include a SAS token; "
+                    "set AZURE_AI_IMAGE_ACCOUNT_KEY or sign in with Azure AD instead."
+                )
+            credential = config.image_account_key
+            if credential is None:
+                # Azure AD (e.g. managed identity); blob URLs are signed with a user delegation key
+                from azure.identity import DefaultAzureCredential
+                
+                credential = DefaultAzureCredential()
+            blob_container_client = ContainerClient.from_container_url(
+                config.image_container_url, credential=credential
+            )
+        
+        # A SAS-authorized or anonymous client cannot sign per-blob read URLs
+        if blob_container_client is not None and not (
+            hasattr(blob_container_client.credential, "account_key")
+            or hasattr(blob_container_client.credential, "get_token")
+        ):
+            raise ValueError(
+                "The blob container client must be authorized with an account key "
+                "or an Azure AD token credential, so that a read-only URL can be "
+                "signed for each uploaded image."
+            )
+        self.blob_container_client = blob_container_client
+        self._delegation_key = None
+        self._delegation_key_expiry = datetime.min.replace(tzinfo=timezone.utc)
+        self._delegation_key_lock = threading.Lock()
+        
+        # Async clients keyed by event loop, each created on first use in that loop
+        self._aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
         )
     
-    def encode_image(self, image_data: bytes) -> str:
+    def encode_image(
+        self,
+        image_data: bytes,
+        mime_type: Optional[str] = None,
+        max_dim: Optional[int] = None
+    ) -> str:
         """
-        Encode image bytes to base64 string for API consumption.
+        Encode image bytes to a base64 data URL for API consumption.
+        
+        The base64 payload is produced as a str directly when pybase64 is
+        available; otherwise it is written straight after the data URL prefix
+        in a single buffer, avoiding an intermediate str copy of the whole image.
         
         Args:
-            image_data: Raw image bytes
+            image_data: Raw image bytes (any bytes-like object, e.g. an mmap)
+            mime_type: MIME type to declare in the data URL (sniffed from
+                the image bytes when not given)
+            max_dim: If set, images larger than this in either dimension are
+                downscaled and re-encoded as JPEG before encoding
             
         Returns:
-            Base64 encoded image string
+            Data URL containing the base64 encoded image
         """
-        return base64.b64encode(image_data).decode('utf-8')
+        if max_dim is not None:
+            image_data = _downscale(image_data, max_dim)
+        mime_type = mime_type or _sniff_mime(image_data)
+        prefix = f"data:{mime_type};base64,"
+        if _b64encode_as_string is not None:
+            return prefix + _b64encode_as_string(image_data)
+        
+        buf = bytearray(prefix.encode("ascii"))
+        buf.extend(_b64.b64encode(image_data))
+        return buf.decode("ascii")
     
     def analyze_image(
         self, 
         image_data: bytes, 
         system_prompt: Optional[str] = None,
-        user_prompt: Optional[str] = None
+        user_prompt: Optional[str] = None,
+        max_dim: Optional[int] = None
     ) -> str:
         """
         Analyze an image using Azure OpenAI GPT-4o vision in a stateless manner.
@@ -68,81 +503,831 @@ class AzureImageAnalyzer:
             image_data: Raw image bytes
             system_prompt: Optional system prompt to guide the AI's behavior
             user_prompt: Optional custom user prompt for analysis
+            max_dim: Optional maximum width/height in pixels; larger images
+                are downscaled client-side before upload
             
         Returns:
             String description of the image
         """
         try:
-            # Encode image
-            encoded_image = self.encode_image(image_data)
+            cache_key, cached, messages = self._prepare(
+                image_data, system_prompt, user_prompt, max_dim
+            )
+            if cached is not None:
+                return cached
             
-            # Default prompts
-            default_system_prompt = (
-                "You are an expert image analyst. Provide detailed, accurate descriptions of images. "
-                "Be thorough but concise in your analysis."
+            # Call Azure OpenAI (the SDK retries transient failures)
+            response = self.client.chat.completions.create(
+                messages=messages,
+                model=self.model,
+                max_tokens=1000,
+                temperature=0.1
             )
+            return self._finish(cache_key, response)
+        
+        except Exception as e:
+            raise Exception(f"Failed to analyze image: {str(e)}")
+    
+    def analyze_image_stream(
+        self,
+        image_data: bytes,
+        system_prompt: Optional[str] = None,
+        user_prompt: Optional[str] = None,
+        max_dim: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Analyze an image, yielding the description as it is generated.
+        
+        A cached result is yielded as a single chunk. The full text is cached
+        once the stream has been consumed completely.
+        
+        Args:
+            image_data: Raw image bytes
+            system_prompt: Optional system prompt to guide the AI's behavior
+            user_prompt: Optional custom user prompt for analysis
+            max_dim: Optional maximum width/height in pixels; larger images
+                are downscaled client-side before upload
+            
+        Yields:
+            Successive text fragments of the image description
+        """
+        try:
+            cache_key, cached, messages = self._prepare(
+                image_data, system_prompt, user_prompt, max_dim
+            )
+            if cached is not None:
+                yield cached
+                return
             
-            default_user_prompt = (
-                "Analyze this image and provide a detailed description. "
-                "Include information about objects, people, setting, colors, mood, "
-                "and any text visible in the image."
+            stream = self.client.chat.completions.create(
+                messages=messages,
+                model=self.model,
+                max_tokens=1000,
+                temperature=0.1,
+                stream=True
             )
             
-            # Use provided prompts or defaults
-            system_message = system_prompt or default_system_prompt
-            user_message = user_prompt or default_user_prompt
+            parts = []
+            for chunk in stream:
+                # Azure sends content filter results in chunks without choices
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        
+        except Exception as e:
+            raise Exception(f"Failed to analyze image: {str(e)}")
+        
+        if cache_key is not None and parts:
+            self.cache.put(cache_key, "".join(parts))
+    
+    async def analyze_image_async(
+        self,
+        image_data: bytes,
+        system_prompt: Optional[str] = None,
+        user_prompt: Optional[str] = None,
+        max_dim: Optional[int] = None
+    ) -> str:
+        """
+        Asynchronous counterpart of analyze_image using AsyncAzureOpenAI.
+        
+        Uses the async client shared by all requests on the running event loop.
+        
+        Args:
+            image_data: Raw image bytes
+            system_prompt: Optional system prompt to guide the AI's behavior
+            user_prompt: Optional custom user prompt for analysis
+            max_dim: Optional maximum width/height in pixels; larger images
+                are downscaled client-side before upload
+            
+        Returns:
+            String description of the image
+        """
+        return await self._analyze_async(
+            self._async_client(), image_data, system_prompt, user_prompt, max_dim
+        )
+    
+    def analyze_multiple_images(
+        self,
+        image_list: List[bytes],
+        system_prompt: Optional[str] = None,
+        user_prompt: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_dim: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze several images concurrently with the same prompts.
+        
+        Each image is an independent, network-bound request, so they are fanned
+        out on a single event loop, bounded by a semaphore.
+        
+        Args:
+            image_list: List of raw image bytes
+            system_prompt: Optional system prompt to guide the AI's behavior
+            user_prompt: Optional custom user prompt for analysis
+            max_concurrency: Maximum number of requests in flight at once
+                (defaults to the analyzer's max_concurrency)
+            max_dim: Optional maximum width/height in pixels; larger images
+                are downscaled client-side before upload
             
-            # Create messages with image - stateless approach (no conversation history)
+        Returns:
+            One dict per image, in input order, with keys index, success and
+            either result or error
+        """
+        if not image_list:
+            return []
+        
+        return asyncio.run(
+            self._analyze_many(
+                image_list,
+                system_prompt,
+                user_prompt,
+                max_concurrency,
+                max_dim
+            )
+        )
+    
+    def analyze_images_batch(
+        self,
+        image_list: List[bytes],
+        system_prompt: Optional[str] = None,
+        user_prompt: Optional[str] = None,
+        max_dim: Optional[int] = None,
+        poll_interval: float = 5.0,
+        max_poll_interval: float = 60.0,
+        on_status: Optional[Callable[[str], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze several images through the Azure OpenAI Batch API and wait for the results.
+        
+        Batch jobs are billed at a lower rate and are not limited by per-request
+        latency, but may take up to 24 hours. The model must be a Global Batch
+        deployment. Cached results are served locally, and only cache misses
+        are submitted, once per distinct image. If waiting is interrupted (or
+        polling fails), the job is cancelled so it does not keep running
+        unattended; use submit_images_batch and poll_images_batch to wait
+        across process or script runs instead.
+        
+        Args:
+            image_list: List of raw image bytes
+            system_prompt: Optional system prompt to guide the AI's behavior
+            user_prompt: Optional custom user prompt for analysis
+            max_dim: Optional maximum width/height in pixels; larger images
+                are downscaled client-side before upload
+            poll_interval: Initial delay in seconds between job status checks
+            max_poll_interval: Upper bound for the exponentially growing delay
+            on_status: Optional callback invoked with the job status after each poll
+            
+        Returns:
+            One dict per image, in input order, with keys index, success and
+            either result or error
+        """
+        job = self.submit_images_batch(image_list, system_prompt, user_prompt, max_dim)
+        
+        # Poll with exponential backoff until the job reaches a final state
+        delay = poll_interval
+        finished = False
+        try:
+            while True:
+                results = self.poll_images_batch(job)
+                if on_status is not None and job.batch_id is not None:
+                    on_status(job.status)
+                if results is not None:
+                    finished = True
+                    return results
+                time.sleep(delay)
+                delay = min(delay * 2, max_poll_interval)
+        
+        except Exception as e:
+            return self._fail_pending(job, f"Batch analysis failed: {str(e)}")
+        
+        finally:
+            # Also reached on KeyboardInterrupt and other BaseExceptions
+            if not finished:
+                self.cancel_images_batch(job)
+    
+    def submit_images_batch(
+        self,
+        image_list: List[bytes],
+        system_prompt: Optional[str] = None,
+        user_prompt: Optional[str] = None,
+        max_dim: Optional[int] = None
+    ) -> BatchJob:
+        """
+        Submit several images as one Azure OpenAI batch job without waiting for it.
+        
+        Cached results are served locally, and only cache misses are submitted,
+        once per distinct image. If the job cannot be submitted, the affected
+        images are marked as failed and the returned job is already finished.
+        
+        Args:
+            image_list: List of raw image bytes
+            system_prompt: Optional system prompt to guide the AI's behavior
+            user_prompt: Optional custom user prompt for analysis
+            max_dim: Optional maximum width/height in pixels; larger images
+                are downscaled client-side before upload
+            
+        Returns:
+            BatchJob to pass to poll_images_batch (or cancel_images_batch)
+        """
+        groups = _group_duplicates(image_list)
+        job = BatchJob(results=[{} for _ in image_list], groups=list(groups.values()))
+        lines = []
+        
+        for image_digest, indices in groups.items():
+            index = indices[0]
+            try:
+                cache_key, cached, messages = self._prepare(
+                    image_list[index],
+                    system_prompt,
+                    user_prompt,
+                    max_dim,
+                    url_ttl=BATCH_BLOB_URL_TTL,
+                    image_digest=image_digest
+                )
+            except Exception as e:
+                job.results[index] = {"index": index, "success": False, "error": str(e)}
+                continue
+            if cached is not None:
+                job.results[index] = {"index": index, "success": True, "result": cached}
+                continue
+            
+            custom_id = str(index)
+            job.pending[custom_id] = cache_key
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": messages,
+                    "max_tokens": 1000,
+                    "temperature": 0.1
+                }
+            }))
+        
+        if not job.pending:
+            return job
+        
+        try:
+            batch_file = self.client.files.create(
+                file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/chat/completions",
+                completion_window="24h"
+            )
+        except Exception as e:
+            self._fail_pending(job, f"Batch analysis failed: {str(e)}")
+            return job
+        
+        job.batch_id = batch.id
+        job.status = batch.status
+        return job
+    
+    def poll_images_batch(self, job: BatchJob) -> Optional[List[Dict[str, Any]]]:
+        """
+        Check a submitted batch job once and collect its results if it has finished.
+        
+        Finished responses are stored in the local cache. Errors while checking
+        the job are raised, so the job can be polled again later.
+        
+        Args:
+            job: BatchJob returned by submit_images_batch
+            
+        Returns:
+            One dict per image, in input order, with keys index, success and
+            either result or error; None while the job is still running (the
+            latest status is in job.status)
+        """
+        if job.batch_id is None or not job.pending:
+            return _copy_to_duplicates(job.results, job.groups)
+        
+        batch = self.client.batches.retrieve(job.batch_id)
+        job.status = batch.status
+        if batch.status not in BATCH_FINAL_STATES:
+            return None
+        
+        output = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                output.extend(self.client.files.content(file_id).text.splitlines())
+        
+        for line in output:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = item.get("custom_id")
+            if custom_id not in job.pending:
+                continue
+            index = int(custom_id)
+            
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                content = response["body"]["choices"][0]["message"]["content"]
+                cache_key = job.pending.pop(custom_id)
+                if cache_key is not None and content is not None:
+                    self.cache.put(cache_key, content)
+                job.results[index] = {"index": index, "success": True, "result": content}
+            else:
+                job.pending.pop(custom_id)
+                error = item.get("error") or response.get("body", {}).get("error") or response
+                job.results[index] = {
+                    "index": index,
+                    "success": False,
+                    "error": f"Failed to analyze image: {error}"
+                }
+        
+        # Requests without an output line (e.g. expired or cancelled jobs)
+        return self._fail_pending(job, f"Batch job {batch.id} ended with status {batch.status}")
+    
+    def cancel_images_batch(self, job: BatchJob) -> None:
+        """Cancel a submitted batch job that has not finished yet (best effort)."""
+        if job.batch_id is None or job.status in BATCH_FINAL_STATES:
+            return
+        try:
+            self.client.batches.cancel(job.batch_id)
+            job.status = "cancelling"
+        except Exception:
+            pass
+    
+    def _fail_pending(self, job: BatchJob, error: str) -> List[Dict[str, Any]]:
+        """Mark every image still waiting on the job as failed and return all results."""
+        for custom_id in job.pending:
+            index = int(custom_id)
+            job.results[index] = {"index": index, "success": False, "error": error}
+        job.pending.clear()
+        return _copy_to_duplicates(job.results, job.groups)
+    
+    def analyze_images_bundled(
+        self,
+        image_list: List[bytes],
+        system_prompt: Optional[str] = None,
+        user_prompt: Optional[str] = None,
+        bundle_size: int = 4,
+        max_concurrency: Optional[int] = None,
+        max_dim: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze several images, packing up to bundle_size of them into each request.
+        
+        Each request carries the prompts once followed by its images, and asks
+        for a JSON object with one analysis per image. For many small images
+        this saves round-trips and repeated prompt tokens. Each request may
+        produce up to 1000 output tokens per image, capped at the deployment's
+        limit (AZURE_AI_MAX_OUTPUT_TOKENS, 4096 by default). Cached results are
+        served locally and byte-identical images are sent once.
+        
+        Args:
+            image_list: List of raw image bytes
+            system_prompt: Optional system prompt to guide the AI's behavior
+            user_prompt: Optional custom user prompt for analysis
+            bundle_size: Maximum number of images per request
+            max_concurrency: Maximum number of requests in flight at once
+                (defaults to the analyzer's max_concurrency)
+            max_dim: Optional maximum width/height in pixels; larger images
+                are downscaled client-side before upload
+            
+        Returns:
+            One dict per image, in input order, with keys index, success and
+            either result or error
+            
+        Raises:
+            ValueError: If bundle_size is less than 1
+        """
+        if bundle_size < 1:
+            raise ValueError(f"bundle_size must be at least 1, got {bundle_size}")
+        
+        return asyncio.run(
+            self._analyze_bundles(
+                image_list, system_prompt, user_prompt, bundle_size, max_concurrency, max_dim
+            )
+        )
+    
+    async def analyze_images_as_completed(
+        self,
+        image_list: List[bytes],
+        system_prompt: Optional[str] = None,
+        user_prompt: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_dim: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Analyze several images concurrently, yielding each result as it finishes.
+        
+        Byte-identical images are analyzed once and the result is yielded for
+        each of their indices. Requests share one AsyncAzureOpenAI client
+        scoped to the running event loop, so connections (and their TLS
+        sessions) are reused across calls on the same loop, and a fresh
+        asyncio.run() gets a fresh client. Call aclose() before the loop ends
+        to release its connections.
+        
+        Args:
+            image_list: List of raw image bytes
+            system_prompt: Optional system prompt to guide the AI's behavior
+            user_prompt: Optional custom user prompt for analysis
+            max_concurrency: Maximum number of requests in flight at once
+                (defaults to the analyzer's max_concurrency)
+            max_dim: Optional maximum width/height in pixels; larger images
+                are downscaled client-side before upload
+            
+        Yields:
+            One dict per image, in completion order, with keys index, success
+            and either result or error
+        """
+        max_requests = max_concurrency or self.max_concurrency
+        max_prepares = os.cpu_count() or 1
+        # Encoding is CPU-bound and requests are I/O-bound, so each stage has its
+        # own limit and the next images are encoded while earlier ones are sent
+        request_semaphore = asyncio.Semaphore(max_requests)
+        prepare_semaphore = asyncio.Semaphore(max_prepares)
+        # Bounds the encoded payloads held in memory at once
+        pipeline_semaphore = asyncio.Semaphore(max_requests + max_prepares)
+        client = self._async_client()
+        
+        async def analyze_one(index: int, image_digest: bytes) -> Dict[str, Any]:
+            async with pipeline_semaphore:
+                try:
+                    result = await self._analyze_async(
+                        client,
+                        image_list[index],
+                        system_prompt,
+                        user_prompt,
+                        max_dim,
+                        prepare_semaphore,
+                        request_semaphore,
+                        image_digest
+                    )
+                    return {"index": index, "success": True, "result": result}
+                except Exception as e:
+                    return {"index": index, "success": False, "error": str(e)}
+        
+        groups = _group_duplicates(image_list)
+        groups_by_first = {indices[0]: indices for indices in groups.values()}
+        for next_done in asyncio.as_completed(
+            [analyze_one(indices[0], image_digest) for image_digest, indices in groups.items()]
+        ):
+            item = await next_done
+            yield item
+            for index in groups_by_first[item["index"]][1:]:
+                yield {**item, "index": index}
+    
+    async def aclose(self) -> None:
+        """Close the running event loop's async client and its connections."""
+        client = self._aclients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+    
+    async def _analyze_many(
+        self,
+        image_list: List[bytes],
+        system_prompt: Optional[str],
+        user_prompt: Optional[str],
+        max_concurrency: Optional[int],
+        max_dim: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        """Collect analyze_images_as_completed results back into input order."""
+        results: List[Dict[str, Any]] = [{} for _ in image_list]
+        try:
+            async for item in self.analyze_images_as_completed(
+                image_list, system_prompt, user_prompt, max_concurrency, max_dim
+            ):
+                results[item["index"]] = item
+        finally:
+            await self.aclose()
+        return results
+    
+    async def _analyze_bundles(
+        self,
+        image_list: List[bytes],
+        system_prompt: Optional[str],
+        user_prompt: Optional[str],
+        bundle_size: int,
+        max_concurrency: Optional[int],
+        max_dim: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        """Serve cache hits, then analyze the misses in concurrent bundles."""
+        system_message = system_prompt or DEFAULT_SYSTEM_PROMPT
+        user_message = user_prompt or DEFAULT_USER_PROMPT
+        
+        results: List[Dict[str, Any]] = [{} for _ in image_list]
+        misses: List[Tuple[int, Optional[bytes]]] = []
+        groups = _group_duplicates(image_list)
+        
+        for image_digest, indices in groups.items():
+            index = indices[0]
+            cache_key = None
+            if self.cache is not None:
+                cache_key = ResponseCache.make_key(
+                    image_list[index],
+                    system_message,
+                    user_message,
+                    self.model,
+                    max_dim,
+                    bundled=True,
+                    image_digest=image_digest
+                )
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    results[index] = {"index": index, "success": True, "result": cached}
+                    continue
+            misses.append((index, cache_key))
+        
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        client = self._async_client()
+        
+        async def analyze_bundle(bundle: List[Tuple[int, Optional[bytes]]]) -> None:
+            async with semaphore:
+                try:
+                    analyses = await self._analyze_bundle_async(
+                        client,
+                        [image_list[index] for index, _ in bundle],
+                        system_message,
+                        user_message,
+                        max_dim
+                    )
+                except Exception as e:
+                    for index, _ in bundle:
+                        results[index] = {"index": index, "success": False, "error": str(e)}
+                    return
+            
+            for (index, cache_key), analysis in zip(bundle, analyses):
+                if cache_key is not None:
+                    self.cache.put(cache_key, analysis)
+                results[index] = {"index": index, "success": True, "result": analysis}
+        
+        try:
+            await asyncio.gather(*(
+                analyze_bundle(misses[start:start + bundle_size])
+                for start in range(0, len(misses), bundle_size)
+            ))
+        finally:
+            await self.aclose()
+        
+        return _copy_to_duplicates(results, list(groups.values()))
+    
+    async def _analyze_bundle_async(
+        self,
+        client,
+        images: List[bytes],
+        system_message: str,
+        user_message: str,
+        max_dim: Optional[int]
+    ) -> List[str]:
+        """Send several images in one request and return one analysis per image."""
+        try:
+            image_parts = await asyncio.gather(*(
+                asyncio.to_thread(self._image_part, image_data, max_dim)
+                for image_data in images
+            ))
+            
+            system_part, text_part = _prefix_messages(system_message, user_message)
             messages = [
-                {
-                    "role": "system",
-                    "content": system_message
-                },
+                system_part,
                 {
                     "role": "user",
                     "content": [
-                        {
-                            "type": "text",
-                            "text": user_message
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{encoded_image}"
-                            }
-                        }
+                        text_part,
+                        {"type": "text", "text": BUNDLE_INSTRUCTION},
+                        *image_parts
                     ]
                 }
             ]
             
-            # Call Azure OpenAI with retry logic
-            response = self._call_with_retry(messages)
-            
-            return response.choices[0].message.content
+            response = await client.chat.completions.create(
+                messages=messages,
+                model=self.model,
+                max_tokens=min(1000 * len(images), self.max_output_tokens),
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            )
+            analyses = json.loads(response.choices[0].message.content or "{}").get("analyses")
         
         except Exception as e:
-            raise Exception(f"Failed to analyze image: {str(e)}")
+            raise Exception(f"Failed to analyze images: {str(e)}")
+        
+        if (
+            not isinstance(analyses, list)
+            or len(analyses) != len(images)
+            or not all(isinstance(analysis, str) for analysis in analyses)
+        ):
+            raise Exception(
+                f"Failed to analyze images: expected {len(images)} text analyses in the response"
+            )
+        return analyses
     
-    def _call_with_retry(self, messages, max_retries: int = 3):
-        """
-        Call Azure OpenAI API with exponential backoff retry logic.
-        Implements Azure best practices for handling transient failures.
+    async def _analyze_async(
+        self,
+        client,
+        image_data: bytes,
+        system_prompt: Optional[str],
+        user_prompt: Optional[str],
+        max_dim: Optional[int],
+        prepare_semaphore: Optional[asyncio.Semaphore] = None,
+        request_semaphore: Optional[asyncio.Semaphore] = None,
+        image_digest: Optional[bytes] = None
+    ) -> str:
         """
-        import time
+        Analyze one image with the given async client.
         
-        for attempt in range(max_retries):
-            try:
-                response = self.client.chat.completions.create(
+        Downscaling and base64 encoding run in a worker thread, so the event
+        loop keeps driving other in-flight requests while this image is encoded.
+        The optional semaphores limit the encoding and the API request
+        separately; the request slot is only taken once the image is encoded.
+        Pillow releases the GIL while decoding, resizing and encoding, so
+        several images are downscaled in parallel across threads.
+        """
+        try:
+            prepare = functools.partial(
+                self._prepare,
+                image_data,
+                system_prompt,
+                user_prompt,
+                max_dim,
+                image_digest=image_digest
+            )
+            async with prepare_semaphore or contextlib.nullcontext():
+                cache_key, cached, messages = await asyncio.to_thread(prepare)
+            if cached is not None:
+                return cached
+            
+            async with request_semaphore or contextlib.nullcontext():
+                response = await client.chat.completions.create(
                     messages=messages,
                     model=self.model,
                     max_tokens=1000,
                     temperature=0.1
                 )
-                return response
-            
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise
-                
-                wait_time = (2 ** attempt) + 1  # Exponential backoff
-                time.sleep(wait_time)
+            return self._finish(cache_key, response)
+        
+        except Exception as e:
+            raise Exception(f"Failed to analyze image: {str(e)}")
+    
+    def _async_client(self):
+        """Return the async client for the running event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            client = self._aclients[loop] = self._new_async_client()
+        return client
+    
+    def _new_async_client(self):
+        """Create an AsyncAzureOpenAI client for the current configuration."""
+        from openai import AsyncAzureOpenAI
+        
+        return AsyncAzureOpenAI(
+            api_version=self.api_version,
+            azure_endpoint=self.endpoint,
+            api_key=self.api_key,
+            **_client_options(is_async=True),
+        )
+    
+    def _prepare(
+        self,
+        image_data: bytes,
+        system_prompt: Optional[str],
+        user_prompt: Optional[str],
+        max_dim: Optional[int],
+        url_ttl: int = BLOB_URL_TTL,
+        image_digest: Optional[bytes] = None
+    ) -> Tuple[Optional[bytes], Optional[str], Optional[List[Dict[str, Any]]]]:
+        """
+        Resolve prompts, consult the cache and build the request messages.
+        
+        Args:
+            url_ttl: Lifetime in seconds of the URL sent for an uploaded image
+            image_digest: Digest of image_data if already computed, so the
+                cache key does not hash the image again
+        
+        Returns:
+            Tuple of (cache key, cached response, messages). Messages are only
+            built on a cache miss.
+        """
+        # Use provided prompts or defaults
+        system_message = system_prompt or DEFAULT_SYSTEM_PROMPT
+        user_message = user_prompt or DEFAULT_USER_PROMPT
+        
+        # Serve identical requests from the local cache
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ResponseCache.make_key(
+                image_data,
+                system_message,
+                user_message,
+                self.model,
+                max_dim,
+                image_digest=image_digest
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cache_key, cached, None
+        
+        # Create messages with image - stateless approach (no conversation history).
+        # Stable prompt text comes first and the image last, so repeated calls
+        # with the same prompts share a cacheable prefix.
+        system_part, text_part = _prefix_messages(system_message, user_message)
+        messages = [
+            system_part,
+            {
+                "role": "user",
+                "content": [
+                    text_part,
+                    self._image_part(image_data, max_dim, url_ttl)
+                ]
+            }
+        ]
+        return cache_key, None, messages
+    
+    def _image_part(
+        self,
+        image_data: bytes,
+        max_dim: Optional[int],
+        url_ttl: int = BLOB_URL_TTL
+    ) -> Dict[str, Any]:
+        """Build the image_url content part that carries one image."""
+        # Reference an uploaded blob, or inline the image as a data URL
+        if self.blob_container_client is not None:
+            image_url = self._upload_image(image_data, max_dim, url_ttl)
+        else:
+            image_url = self.encode_image(image_data, max_dim=max_dim)
+        
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": image_url
+            }
+        }
+    
+    def _upload_image(self, image_data: bytes, max_dim: Optional[int], url_ttl: int) -> str:
+        """
+        Upload the image to the configured blob container and return a URL for it.
+        
+        The URL carries a read-only SAS for this blob alone that expires after
+        url_ttl seconds, so the service can fetch the image without being handed
+        the container's credential. Uploaded blobs are not deleted here, so the
+        container should have a lifecycle rule that expires them.
+        """
+        from azure.storage.blob import BlobSasPermissions, ContentSettings, generate_blob_sas
+        
+        if max_dim is not None:
+            image_data = _downscale(image_data, max_dim)
+        
+        container = self.blob_container_client
+        blob_client = container.upload_blob(
+            name=uuid.uuid4().hex,
+            data=image_data,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=_sniff_mime(image_data))
+        )
+        
+        now = datetime.now(timezone.utc)
+        expiry = now + timedelta(seconds=url_ttl)
+        if hasattr(container.credential, "account_key"):
+            signing_key = {"account_key": container.credential.account_key}
+        else:
+            signing_key = {"user_delegation_key": self._user_delegation_key(expiry)}
+        
+        sas = generate_blob_sas(
+            account_name=container.account_name,
+            container_name=container.container_name,
+            blob_name=blob_client.blob_name,
+            permission=BlobSasPermissions(read=True),
+            # Allow for clock skew between this machine and the service
+            start=now - timedelta(minutes=5),
+            expiry=expiry,
+            **signing_key
+        )
+        return f"{blob_client.url}?{sas}"
+    
+    def _user_delegation_key(self, valid_until: datetime):
+        """Return a user delegation key valid until at least valid_until, renewing it if needed."""
+        from azure.storage.blob import BlobServiceClient
+        
+        with self._delegation_key_lock:
+            if self._delegation_key is None or self._delegation_key_expiry < valid_until:
+                now = datetime.now(timezone.utc)
+                # One key signs every upload for a day; the service allows up to seven
+                expiry = valid_until + timedelta(days=1)
+                url = urlsplit(self.blob_container_client.url)
+                service = BlobServiceClient(
+                    f"{url.scheme}://{url.netloc}",
+                    credential=self.blob_container_client.credential
+                )
+                self._delegation_key = service.get_user_delegation_key(
+                    now - timedelta(minutes=5), expiry
+                )
+                self._delegation_key_expiry = expiry
+            return self._delegation_key
+    
+    def _finish(self, cache_key: Optional[bytes], response) -> str:
+        """Extract the response text and store it in the cache."""
+        content = response.choices[0].message.content
+        
+        if cache_key is not None and content is not None:
+            self.cache.put(cache_key, content)
+        
+        return content
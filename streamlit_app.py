@@ -6,10 +6,16 @@ Upload images and analyze them using Azure OpenAI GPT-4o vision.
 
 import streamlit as st
 from PIL import Image
+import asyncio
 import io
-from typing import List
+from typing import List, Optional, Tuple
 
-from image_analyzer import AzureImageAnalyzer
+from image_analyzer import (
+    AzureImageAnalyzer,
+    DEFAULT_SYSTEM_PROMPT,
+    DEFAULT_USER_PROMPT,
+    DOWNSCALE_MIN_BYTES
+)
 
 # Configure Streamlit page
 st.set_page_config(
@@ -19,25 +25,162 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state
-if 'analyzer' not in st.session_state:
-    try:
-        st.session_state.analyzer = AzureImageAnalyzer()
-    except Exception as e:
-        st.error(f"Failed to initialize Azure OpenAI: {str(e)}")
-        st.stop()
+@st.cache_resource
+def get_analyzer() -> AzureImageAnalyzer:
+    """Create the analyzer once and share it (and its HTTP client) across all sessions."""
+    return AzureImageAnalyzer()
+
+# Not cached with st.cache_data: hashing the whole upload costs far more than the header parse
+def get_image_info(image_bytes: bytes) -> Tuple[int, int, str]:
+    """Return (width, height, format) of an image, reading only its header."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return image.size[0], image.size[1], image.format
+
+def format_result(item: dict) -> str:
+    """Turn an analyzer result dict into the text shown for that image."""
+    if item["success"]:
+        return item["result"]
+    return f"Error analyzing image: {item['error']}"
+
+def submit_batch_job(
+    analyzer: AzureImageAnalyzer,
+    images: List[Tuple[str, bytes]],
+    system_prompt: str,
+    user_prompt: str,
+    max_dim: Optional[int]
+) -> None:
+    """Submit all images as one Azure OpenAI batch job and remember it in the session."""
+    with st.spinner("Submitting batch job..."):
+        job = analyzer.submit_images_batch(
+            [image_bytes for _, image_bytes in images],
+            system_prompt=system_prompt if system_prompt.strip() else None,
+            user_prompt=user_prompt if user_prompt.strip() else None,
+            max_dim=max_dim
+        )
+    
+    # Kept in the session (not the script run) so later runs can collect the results
+    st.session_state.batch_job = (job, [filename for filename, _ in images])
+    request_batch_poll()
 
-def analyze_single_image(image_bytes: bytes, system_prompt: str, user_prompt: str) -> str:
-    """Analyze a single image and return the result."""
+def request_batch_poll() -> None:
+    """Have the next run check the batch job with the service."""
+    st.session_state.batch_job_poll = True
+
+def check_batch_job(analyzer: AzureImageAnalyzer) -> Optional[List[Tuple[str, str]]]:
+    """Show the session's batch job, returning its results once it has finished."""
+    job, filenames = st.session_state.batch_job
+    items = None
+    
+    # Only contact the service right after submitting or when asked to, not on
+    # every rerun caused by typing in the sidebar
+    if st.session_state.pop("batch_job_poll", False):
+        try:
+            items = analyzer.poll_images_batch(job)
+        except Exception as e:
+            st.error(f"Failed to check batch job {job.batch_id}: {str(e)}")
+    
+    if items is None:
+        st.info(
+            f"Batch job {job.batch_id} status: {job.status} (as of the last check). "
+            "Results appear here once it finishes (up to 24 hours)."
+        )
+        refresh_col, cancel_col = st.columns([1, 1])
+        refresh_col.button(
+            "🔄 Check Status", on_click=request_batch_poll, use_container_width=True
+        )
+        if cancel_col.button("✖️ Cancel Batch Job", use_container_width=True):
+            analyzer.cancel_images_batch(job)
+            del st.session_state.batch_job
+            st.rerun()
+        return None
+    
+    del st.session_state.batch_job
+    return [(filename, format_result(item)) for filename, item in zip(filenames, items)]
+
+def show_results(results: List[Tuple[str, str]]) -> None:
+    """Render one expander per analyzed image."""
+    st.success("✅ Analysis complete!")
+    
+    for filename, result in results:
+        with st.expander(f"📋 Analysis: {filename}", expanded=True):
+            st.markdown("**Result:**")
+            st.write(result)
+
+def analyze_all_images_bundled(
+    analyzer: AzureImageAnalyzer,
+    images: List[Tuple[str, bytes]],
+    system_prompt: str,
+    user_prompt: str,
+    max_dim: Optional[int],
+    bundle_size: int
+) -> List[Tuple[str, str]]:
+    """Analyze all images with several images packed into each request."""
+    with st.spinner(f"Analyzing {len(images)} image(s) in bundles of {bundle_size}..."):
+        items = analyzer.analyze_images_bundled(
+            [image_bytes for _, image_bytes in images],
+            system_prompt=system_prompt if system_prompt.strip() else None,
+            user_prompt=user_prompt if user_prompt.strip() else None,
+            bundle_size=bundle_size,
+            max_dim=max_dim
+        )
+    
+    return [(filename, format_result(item)) for (filename, _), item in zip(images, items)]
+
+async def analyze_all_images(
+    analyzer: AzureImageAnalyzer,
+    images: List[Tuple[str, bytes]],
+    system_prompt: str,
+    user_prompt: str,
+    max_dim: Optional[int],
+    status
+) -> List[Tuple[str, str]]:
+    """Analyze all images concurrently, updating the status label as they complete."""
+    results = [None] * len(images)
+    done = 0
+    # Update the label about 20 times per run rather than once per image
+    update_every = max(1, len(images) // 20)
+    
     try:
-        result = st.session_state.analyzer.analyze_image(
-            image_data=image_bytes,
+        async for item in analyzer.analyze_images_as_completed(
+            [image_bytes for _, image_bytes in images],
             system_prompt=system_prompt if system_prompt.strip() else None,
-            user_prompt=user_prompt if user_prompt.strip() else None
+            user_prompt=user_prompt if user_prompt.strip() else None,
+            max_dim=max_dim
+        ):
+            filename = images[item["index"]][0]
+            results[item["index"]] = (filename, format_result(item))
+            
+            # Update progress
+            done += 1
+            if done % update_every == 0 or done == len(images):
+                status.update(label=f"Analyzed {done}/{len(images)} image(s)")
+    finally:
+        # This event loop ends with the asyncio.run() call, so release its connections
+        await analyzer.aclose()
+    
+    return results
+
+def stream_single_image(
+    analyzer: AzureImageAnalyzer,
+    image_bytes: bytes,
+    system_prompt: str,
+    user_prompt: str,
+    max_dim: Optional[int]
+) -> str:
+    """Render an analysis as it is generated and return the full text."""
+    try:
+        return st.write_stream(
+            analyzer.analyze_image_stream(
+                image_bytes,
+                system_prompt=system_prompt if system_prompt.strip() else None,
+                user_prompt=user_prompt if user_prompt.strip() else None,
+                max_dim=max_dim
+            )
         )
-        return result
     except Exception as e:
-        return f"Error analyzing image: {str(e)}"
+        result = f"Error analyzing image: {str(e)}"
+        st.write(result)
+        return result
 
 def main():
     """Main Streamlit application."""
@@ -56,7 +199,7 @@ def main():
         
         system_prompt = st.text_area(
             "System Prompt",
-            value="You are an expert image analyst. Provide detailed, accurate descriptions of images. Be thorough but concise in your analysis.",
+            value=DEFAULT_SYSTEM_PROMPT,
             height=120,
             help="This prompt will be used for all image analyses to guide the AI's behavior."
         )
@@ -67,11 +210,49 @@ def main():
         
         user_prompt = st.text_area(
             "Analysis Prompt",
-            value="Analyze this image and provide a detailed description. Include information about objects, people, setting, colors, mood, and any text visible in the image.",
+            value=DEFAULT_USER_PROMPT,
             height=100,
             help="This prompt specifies what analysis you want performed on each image."
         )
         
+        # Image preprocessing
+        st.subheader("🖼️ Image Size")
+        downscale = st.toggle(
+            "Downscale large images",
+            value=True,
+            help="Shrink large images and re-encode them as JPEG before upload. "
+                 "Smaller uploads are faster and use fewer vision tokens."
+        )
+        max_dim_value = st.slider(
+            "Max image dimension",
+            min_value=512,
+            max_value=4096,
+            value=2048,
+            step=256,
+            disabled=not downscale,
+            help=f"Files larger than {DOWNSCALE_MIN_BYTES // 1024} KiB that are wider or taller "
+                 "than this many pixels are downscaled before analysis; smaller files are sent as-is."
+        )
+        max_dim = max_dim_value if downscale else None
+        
+        # Batch processing
+        st.subheader("📦 Batch Processing")
+        use_batch_api = st.toggle(
+            "Use Batch API (cheaper, async)",
+            value=False,
+            help="Submit multi-image analyses as one Azure OpenAI batch job. "
+                 "Requires a Global Batch deployment; jobs can take up to 24 hours."
+        )
+        bundle_size = st.slider(
+            "Images per request",
+            min_value=1,
+            max_value=8,
+            value=1,
+            disabled=use_batch_api,
+            help="Send several images in one request, sharing a single copy of the prompts. "
+                 "Fewer round-trips and prompt tokens for many small images."
+        )
+        
         # Model information
         st.subheader("ℹ️ Model Info")
         st.markdown("""
@@ -97,59 +278,84 @@ def main():
         if uploaded_files:
             st.success(f"✅ {len(uploaded_files)} image(s) uploaded successfully!")
             
+            # Read each upload once; the same bytes feed the preview and the analysis
+            images = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+            
             # Display uploaded images
             st.subheader("Uploaded Images")
-            for i, uploaded_file in enumerate(uploaded_files):
-                with st.expander(f"📷 {uploaded_file.name}", expanded=True):
-                    # Display image
-                    image = Image.open(uploaded_file)
-                    st.image(image, caption=uploaded_file.name, use_column_width=True)
+            for filename, image_bytes in images:
+                with st.expander(f"📷 {filename}", expanded=True):
+                    # Display image; the encoded bytes are sent to the browser as-is
+                    st.image(image_bytes, caption=filename, use_column_width=True)
                     
                     # Image info
-                    st.caption(f"Size: {image.size[0]}x{image.size[1]} pixels | Format: {image.format}")
+                    width, height, image_format = get_image_info(image_bytes)
+                    st.caption(f"Size: {width}x{height} pixels | Format: {image_format}")
     
     with col2:
         st.header("🤖 Analysis Results")
         
+        # Collect a batch job submitted by an earlier run
+        if "batch_job" in st.session_state:
+            results = check_batch_job(get_analyzer())
+            if results is not None:
+                show_results(results)
+        
         if uploaded_files:
             # Analyze button
-            if st.button("🔍 Analyze All Images", type="primary", use_container_width=True):
-                
-                # Create progress bar
-                progress_bar = st.progress(0)
-                status_text = st.empty()
+            # One batch job at a time per session, so its results are not lost
+            if st.button(
+                "🔍 Analyze All Images",
+                type="primary",
+                use_container_width=True,
+                disabled="batch_job" in st.session_state
+            ):
                 
-                results = []
-                
-                for i, uploaded_file in enumerate(uploaded_files):
-                    # Update progress
-                    progress = (i + 1) / len(uploaded_files)
-                    progress_bar.progress(progress)
-                    status_text.text(f"Analyzing {uploaded_file.name}... ({i+1}/{len(uploaded_files)})")
-                    
-                    # Read image bytes
-                    uploaded_file.seek(0)  # Reset file pointer
-                    image_bytes = uploaded_file.read()
-                    
-                    # Analyze image
-                    with st.spinner(f"Analyzing {uploaded_file.name}..."):
-                        result = analyze_single_image(image_bytes, system_prompt, user_prompt)
-                        results.append((uploaded_file.name, result))
+                # Create the analyzer on first use so the page renders without waiting on Azure
+                try:
+                    analyzer = get_analyzer()
+                except Exception as e:
+                    st.error(f"Failed to initialize Azure OpenAI: {str(e)}")
+                    st.stop()
                 
-                # Clear progress indicators
-                progress_bar.empty()
-                status_text.empty()
-                
-                # Display results
-                st.success("✅ Analysis complete!")
-                
-                for filename, result in results:
+                if len(images) == 1:
+                    # Stream a single analysis so text appears as it is generated
+                    filename, image_bytes = images[0]
                     with st.expander(f"📋 Analysis: {filename}", expanded=True):
                         st.markdown("**Result:**")
-                        st.write(result)
-                        
-                        # Copy button for result
-                        st.code(result, language=None)
+                        stream_single_image(
+                            analyzer, image_bytes, system_prompt, user_prompt, max_dim
+                        )
+                    
+                    st.success("✅ Analysis complete!")
+                
+                else:
+                    if use_batch_api:
+                        # Don't block the script run on the job; the rerun checks it once
+                        submit_batch_job(
+                            analyzer, images, system_prompt, user_prompt, max_dim
+                        )
+                        st.rerun()
+                    elif bundle_size > 1:
+                        results = analyze_all_images_bundled(
+                            analyzer, images, system_prompt, user_prompt, max_dim, bundle_size
+                        )
+                    else:
+                        # Analyze images concurrently on a single event loop
+                        with st.status(f"Analyzing {len(images)} image(s)...") as status:
+                            results = asyncio.run(
+                                analyze_all_images(
+                                    analyzer,
+                                    images,
+                                    system_prompt,
+                                    user_prompt,
+                                    max_dim,
+                                    status
+                                )
+                            )
+                            status.update(state="complete")
+                    
+                    show_results(results)
         else:
             st.info("👆 Upload images to see analysis results here.")
             